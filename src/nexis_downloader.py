@@ -8,19 +8,197 @@ Nexis Download Manager - Python Implementation (Idempotent Version)
 
 from __future__ import annotations
 
+import atexit
+import collections
+import functools
+import hashlib
+import importlib.util
+import json
+import mmap
 import os
+import random
+import socket
 import sys
 import shutil
 import subprocess
+import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Tuple, Optional, Dict
-from urllib.parse import urlparse
+from types import MappingProxyType
+from typing import Tuple, Optional, Dict, List, Mapping
 
+import httpx
 import requests
 from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
 from urllib3.util.retry import Retry
 
+# Seconds a cached CivitAI metadata entry is trusted without revalidation
+META_CACHE_TTL = 600
+# Older entries may still prove a file is already in place (no HTTP at all) up to this age
+META_CACHE_MAX_AGE = 24 * 3600
+
+# Statuses worth retrying on both HTTP clients
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+API_RETRIES = 5
+
+# Token validation results are reused across runs for this many seconds
+TOKEN_CACHE_TTL = 300
+# Accepted tokens rarely change between container restarts, so a positive answer is kept
+# much longer; a revoked token then surfaces as a 401/403 download hint instead
+TOKEN_CACHE_VALID_TTL = 24 * 3600
+TOKEN_CACHE_VERSION = 1
+TOKEN_CACHE_FILE = Path.home() / ".cache" / "catalyst" / "tokens.json"
+
+# Bytes handed to hashlib per update() call
+HASH_CHUNK_SIZE = 4 << 20
+
+# Existing files are verified on the (wide) redirect-resolution pool, concurrently
+# with network work; cap how many are hashed at once so disks don't thrash
+_HASH_SLOTS = threading.BoundedSemaphore(os.cpu_count() or 1)
+
+# Final model folders under models_dir: one per CivitAI model type, plus HF snapshots
+MODEL_SUBDIRS = ("checkpoints", "loras", "vae", "huggingface")
+
+# Built-in downloader (used when aria2c is missing): smallest byte range worth its own connection
+RANGE_MIN_SPLIT = 8 << 20
+
+# Upper bound on aria2c sockets across all concurrently downloading CivitAI files
+ARIA2_MAX_CONNECTIONS = 32
+
+# How much of a failed tool's stderr is kept for error hints
+STDERR_TAIL_BYTES = 64 * 1024
+
+# huggingface_hub reads this at import time and errors if the backend is missing,
+# so only opt in to the Rust multi-connection downloader when it is installed
+if importlib.util.find_spec("hf_transfer") is not None:
+    os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+
+# aria2c failure hints: exit codes first, then substrings of the lower-cased stderr tail
+_ARIA2_EXIT_HINTS = {
+    32: "   HINT: Checksum verification FAILED — file was corrupted in transit.",
+    22: "   HINT: HTTP error — auth or URL issue.",
+}
+_STDERR_HINTS = (
+    (("403", "forbidden"), "   HINT: Private model. Provide a valid CIVITAI_TOKEN."),
+    (("404", "not found"), "   HINT: A model ID may not exist or was removed."),
+    (("timeout", "connection"), "   HINT: Network issue. Retry may succeed."),
+)
+
+# TCP keepalive on pooled API sockets, so connections idling through a long download
+# phase aren't silently dropped by NAT/conntrack middleboxes (Linux option names)
+_KEEPALIVE_SOCKET_OPTIONS = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)] + [
+    (socket.IPPROTO_TCP, getattr(socket, name), value)
+    for name, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 15), ("TCP_KEEPCNT", 4))
+    if hasattr(socket, name)
+]
+
+# Serializes log lines emitted from worker threads
+_LOG_LOCK = threading.Lock()
+
+# Serializes read-modify-write updates of TOKEN_CACHE_FILE across threads and instances
+_TOKEN_CACHE_LOCK = threading.Lock()
+
+# A successful readiness check is trusted process-wide for this long (monotonic deadline)
+NET_READY_TTL = 30
+# Cap on the exponential backoff between readiness probe rounds
+NET_PROBE_MAX_WAIT = 8
+_net_ready_until = 0.0
+
+# Shared pool for the network readiness probes (one thread per probed host)
+_PROBE_POOL = ThreadPoolExecutor(max_workers=3, thread_name_prefix="net-probe")
+
+
+def _sha256_file(file_path: Path) -> str:
+    """Hash a file in one sequential pass without keeping it in the page cache."""
+    # hashlib uses OpenSSL's SHA-NI path; feeding it slices of an mmap avoids a userspace copy
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        fd = f.fileno()
+        size = os.fstat(fd).st_size
+        if size:
+            with mmap.mmap(fd, 0, prot=mmap.PROT_READ) as mm:
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+                view = memoryview(mm)
+                try:
+                    for off in range(0, size, HASH_CHUNK_SIZE):
+                        h.update(view[off:off + HASH_CHUNK_SIZE])
+                finally:
+                    view.release()
+        if hasattr(os, "posix_fadvise"):
+            # Multi-GB models would otherwise evict everything else from the cache
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    return h.hexdigest()
+
+
+def _aria2_connections() -> int:
+    """Per-file aria2c connections from NEXIS_ARIA2_X (or legacy ARIA2_X), capped at aria2c's max of 16."""
+    return max(1, min(16, int(os.getenv("NEXIS_ARIA2_X") or os.getenv("ARIA2_X") or 16)))
+
+
+class JitteredRetry(Retry):
+    """Retry with full-jitter backoff so parallel workers don't retry in lockstep."""
+
+    RETRY_AFTER_MAX = 60
+
+    def get_backoff_time(self) -> float:
+        return random.uniform(0, super().get_backoff_time())
+
+    def get_retry_after(self, response) -> Optional[float]:
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.RETRY_AFTER_MAX)
+
+
+# Retry objects are immutable (each attempt works on a copy), so one policy serves every adapter
+_RETRY_POLICY = JitteredRetry(
+    total=5,
+    backoff_factor=1.0,
+    status_forcelist=list(RETRY_STATUSES),
+    allowed_methods=frozenset({"HEAD", "GET", "OPTIONS"}),
+    respect_retry_after_header=True,
+)
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled sockets enable TCP keepalive."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault("socket_options", HTTPConnection.default_socket_options + _KEEPALIVE_SOCKET_OPTIONS)
+        super().init_poolmanager(*args, **kwargs)
+
+
+def _clean_token(token: Optional[str]) -> Optional[str]:
+    """Normalize a token once at the API boundary: stripped, or None if blank."""
+    return (token or "").strip() or None
+
+
+@functools.lru_cache(maxsize=8)
+def _bearer(token: Optional[str]) -> Mapping[str, str]:
+    """Auth headers for a token, built once and shared read-only across requests."""
+    return MappingProxyType({"Authorization": f"Bearer {token}"} if token else {})
+
+
+@functools.lru_cache(maxsize=None)
+def _which(tool: str) -> Optional[str]:
+    """shutil.which, memoized process-wide; PATH does not change during a run."""
+    return shutil.which(tool)
+
+
+@functools.lru_cache(maxsize=1)
+def _shared_session() -> requests.Session:
+    """Process-wide requests session with retry logic, shared by all downloader instances."""
+    session = requests.Session()
+    adapter = KeepAliveAdapter(pool_connections=32, pool_maxsize=64, max_retries=_RETRY_POLICY)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": "Catalyst/1.0"})
+    atexit.register(session.close)
+    return session
+
 
 class NexisDownloader:
     def __init__(self, debug_mode: bool = False):
@@ -29,47 +207,174 @@ class NexisDownloader:
         self.models_dir = Path("/home/comfyuser/workspace/models")
         self.download_tmp_dir.mkdir(exist_ok=True)
         self.models_dir.mkdir(exist_ok=True)
-        self.session = self._create_session()
+        self.session = _shared_session()
+        self.api = self._create_api_client()
+
+        # On-disk CivitAI metadata cache (one JSON file per model/token combination)
+        self.meta_cache_dir = self.download_tmp_dir / "meta_cache"
+        self.meta_cache_dir.mkdir(exist_ok=True)
+        self._meta_memo: Dict[Tuple[str, bool], dict] = {}
+        self._meta_lock = threading.Lock()
+
+        # Content-addressed store of verified CivitAI files (hard links keyed by SHA256)
+        self.hash_store_dir = self.download_tmp_dir / "by-sha256"
+        self.hash_store_dir.mkdir(exist_ok=True)
+        self._prune_hash_store()
+
+        # "<sha256> <size> <mtime_ns>" per verified model file, so re-runs skip re-hashing.
+        # Kept here rather than as sidecars so the model folders only hold models.
+        self.verified_dir = self.download_tmp_dir / "verified"
+        self.verified_dir.mkdir(exist_ok=True)
+
+        # One empty file per HF repo whose snapshot_download returned. snapshot_download
+        # populates local_dir as it goes, so a non-empty repo folder may be half done.
+        self.hf_complete_dir = self.download_tmp_dir / "hf_complete"
+        self.hf_complete_dir.mkdir(exist_ok=True)
         
+        # Tokens are validated lazily, once, on first use (None = not checked yet)
+        self._hf_token_valid: Optional[bool] = None
+        self._civitai_token_valid: Optional[bool] = None
+        # One lock per service so the concurrent HF and CivitAI phases never wait on each other
+        self._hf_token_lock = threading.Lock()
+        self._civitai_token_lock = threading.Lock()
+
+        # Model type -> existing final directory, so the hot path does no mkdir per model
+        self._type_dirs: Dict[str, Path] = {}
+
+        # Set on Ctrl-C so queued work returns immediately instead of starting
+        self._cancelled = threading.Event()
+        # Running external tools, so cancel() can stop them mid-transfer
+        self._procs: set = set()
+        self._procs_lock = threading.Lock()
+
         # Completion marker file
         self.completion_marker = self.download_tmp_dir / ".catalyst_downloads_complete"
 
     # ---------- infra ----------
 
-    def _create_session(self) -> requests.Session:
-        """Create a requests session with retry logic."""
-        session = requests.Session()
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=2,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=frozenset({"HEAD", "GET", "OPTIONS"}),
-            respect_retry_after_header=True,
+    def _create_api_client(self) -> httpx.Client:
+        """Create an HTTP/2 client for short API calls (metadata, token checks, probes).
+
+        Requests to the same host are multiplexed over one TLS connection; the
+        requests session is kept for everything else.
+        """
+        # Limits belong on the transport: Client ignores http2/limits when one is passed.
+        # No transport-level retries; _api_request retries, readiness probes must not.
+        return httpx.Client(
+            timeout=30,
+            headers={"User-Agent": "Catalyst/1.0"},
+            transport=httpx.HTTPTransport(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=40),
+                socket_options=_KEEPALIVE_SOCKET_OPTIONS,
+            ),
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("https://", adapter)
-        session.mount("http://", adapter)
-        session.headers.update({"User-Agent": "Catalyst/1.0"})
-        return session
-
-    def _require_tools(self, *tools: str) -> bool:
-        """Ensure required CLI tools exist in PATH."""
-        missing = [t for t in tools if not shutil.which(t)]
-        if missing:
-            self.log(f"❌ Required tools not found: {', '.join(missing)}")
-            return False
-        return True
+
+    def _api_request(self, method: str, url: str, headers: Mapping[str, str], timeout: float) -> httpx.Response:
+        """Send via the HTTP/2 client, retrying connect failures and 429/5xx with full-jitter backoff."""
+        for attempt in range(API_RETRIES + 1):
+            try:
+                r = self.api.request(method, url, headers=headers, timeout=timeout)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # Nothing was sent yet, so retrying is safe for any method
+                if attempt == API_RETRIES:
+                    raise
+                delay = random.uniform(0, 2 ** attempt)
+                self.log(f"Connect to {url} failed ({e}); retrying in {delay:.1f}s", is_debug=True)
+                time.sleep(delay)
+                continue
+            if r.status_code not in RETRY_STATUSES or attempt == API_RETRIES:
+                return r
+            retry_after = r.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                delay = min(float(retry_after), JitteredRetry.RETRY_AFTER_MAX)
+            else:
+                delay = random.uniform(0, 2 ** attempt)
+            self.log(f"HTTP {r.status_code} from {url}; retrying in {delay:.1f}s", is_debug=True)
+            time.sleep(delay)
+        return r
+
+    def cancel(self) -> None:
+        """Stop starting new downloads and terminate running aria2c processes.
+
+        aria2c keeps its control files on SIGTERM and _discard_partial leaves them
+        alone once cancelled, so those files resume next run.
+        In-process transfers (snapshot_download, the built-in range downloader)
+        cannot be interrupted from another thread and keep running until they
+        finish or fail; main() abandons them by exiting the process.
+        """
+        self._cancelled.set()
+        with self._procs_lock:
+            for proc in self._procs:
+                proc.terminate()
+
+    def close(self) -> None:
+        """Release this instance's connections.
+
+        The shared requests session stays open for other instances and is closed at exit.
+        """
+        self.api.close()
+
+    def __enter__(self) -> "NexisDownloader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _run(self, cmd: List[str]) -> subprocess.CompletedProcess:
+        """Run an external tool; raises CalledProcessError carrying the tail of stderr.
+
+        stdout is discarded unless in debug mode. stderr is always drained into
+        a bounded buffer (and echoed in debug mode), so error hints work either
+        way and chatty tools never grow our memory.
+        """
+        stdout = None if self.debug_mode else subprocess.DEVNULL
+        # Bounded by bytes, not chunks: unbuffered reads often return a single short line
+        tail: collections.deque = collections.deque()
+        kept = 0
+        # Keep this spawn free of preexec_fn and user/group/extra_groups: those are what make
+        # CPython give up vfork() for fork(). Inherited fds are closed with close_range(),
+        # so spawn cost stays flat however many sockets and threads we hold open.
+        with subprocess.Popen(cmd, stdout=stdout, stderr=subprocess.PIPE, bufsize=0) as proc:
+            with self._procs_lock:
+                if self._cancelled.is_set():
+                    proc.terminate()
+                self._procs.add(proc)
+            for chunk in iter(lambda: proc.stderr.read(4096), b""):
+                tail.append(chunk)
+                kept += len(chunk)
+                while kept - len(tail[0]) >= STDERR_TAIL_BYTES:
+                    kept -= len(tail.popleft())
+                if self.debug_mode:
+                    sys.stderr.buffer.write(chunk)
+                    sys.stderr.flush()
+            returncode = proc.wait()
+            with self._procs_lock:
+                self._procs.discard(proc)
+        stderr = b"".join(tail)[-STDERR_TAIL_BYTES:].decode("utf-8", errors="replace")
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, cmd, stderr=stderr)
+        return subprocess.CompletedProcess(cmd, returncode, stderr=stderr)
+
+    @staticmethod
+    def _workers(name: str, default: int) -> int:
+        """Read a worker count from ``name``, falling back to NEXIS_PARALLEL, then ``default``."""
+        return max(1, int(os.getenv(name) or os.getenv("NEXIS_PARALLEL") or default))
 
     def log(self, message: str, is_debug: bool = False) -> None:
         """Logging with optional debug gating."""
         if is_debug and not self.debug_mode:
             return
         prefix = "[DOWNLOAD-DEBUG]" if is_debug else "[DOWNLOAD]"
-        print(f"  {prefix} {message}")
+        line = f"  {prefix} {message}\n"
+        # One write per line: print() issues separate writes for the text and the newline
+        with _LOG_LOCK:
+            sys.stdout.write(line)
 
     def check_completion_marker(self) -> bool:
         """Check if downloads were already completed in a previous run."""
-        if self.completion_marker.exists():
+        # lexists: one lstat, and the marker's mere presence is what counts
+        if os.path.lexists(self.completion_marker):
             self.log("✅ Found completion marker - downloads already finished")
             return True
         return False
@@ -82,130 +387,246 @@ class NexisDownloader:
         except Exception as e:
             self.log(f"Warning: Could not create completion marker: {e}")
 
-    def wait_for_network_ready(self, timeout: int = 60) -> bool:
-        """Wait for basic network connectivity."""
+    def _probe(self, host: str) -> bool:
+        """HEAD a host through the API client; any HTTP answer means the path works.
+
+        Deliberately a single attempt: wait_for_network_ready owns the retry
+        schedule. The connection stays pooled, so token checks and metadata
+        fetches that follow skip the TCP and TLS handshakes.
+        """
+        try:
+            self.api.head(f"https://{host}/", timeout=3)
+            return True
+        except httpx.HTTPError:
+            return False
+
+    def wait_for_network_ready(self, timeout: int = 60,
+                               hosts: Tuple[str, ...] = ("civitai.com", "huggingface.co")) -> bool:
+        """Wait until every host in ``hosts`` answers, backing off exponentially between rounds."""
+        global _net_ready_until
+        if not hosts:
+            return True
+        if time.monotonic() < _net_ready_until:
+            self.log("Network readiness confirmed recently - skipping probes", is_debug=True)
+            return True
         self.log("Checking network readiness...")
-        test_urls = [
-            "https://8.8.8.8",
-            "https://civitai.com",
-            "https://huggingface.co"
-        ]
-        start = time.time()
-        while time.time() - start < timeout:
-            all_ready = True
-            for url in test_urls:
-                try:
-                    r = self.session.head(url, timeout=5)
-                    if r.status_code not in (200, 301, 302):
-                        all_ready = False
-                        break
-                except Exception:
-                    all_ready = False
-                    break
-            if all_ready:
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            # Probe all hosts at once so each round costs the slowest RTT, not the sum
+            futures = [_PROBE_POOL.submit(self._probe, host) for host in hosts]
+            if all(f.result() for f in futures):
+                _net_ready_until = time.monotonic() + NET_READY_TTL
                 self.log("✅ Network connectivity confirmed")
                 return True
-            self.log("Waiting for network connectivity...", is_debug=True)
-            time.sleep(2)
+            # 0.25s, 0.5s, 1s, ... capped at 8s, plus jitter; short first waits catch a link coming up
+            delay = min(NET_PROBE_MAX_WAIT, 0.25 * 2 ** attempt) + random.uniform(0, 0.5)
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.log(f"Waiting for network connectivity (retry in {delay:.1f}s)...", is_debug=True)
+            time.sleep(min(delay, remaining))
         self.log("❌ Network readiness timeout")
         return False
 
-    def validate_tokens(self, hf_token: Optional[str], civitai_token: Optional[str]) -> Tuple[bool, bool]:
-        """Validate tokens with lightweight API checks (non-fatal)."""
-        hf_valid = True
-        civitai_valid = True
+    def _token_cache_key(self, service: str, token: str) -> str:
+        return f"v{TOKEN_CACHE_VERSION}:{service}:{hashlib.sha256(token.encode()).hexdigest()[:16]}"
 
-        if hf_token:
-            try:
-                r = self.session.get(
-                    "https://huggingface.co/api/whoami-v2",
-                    headers={"Authorization": f"Bearer {hf_token}"},
-                    timeout=10,
-                )
-                hf_valid = (r.status_code == 200)
-                self.log("✅ HuggingFace token validated" if hf_valid else "❌ HuggingFace token validation failed")
-            except Exception as e:
-                self.log(f"HuggingFace token validation error: {e}")
-                hf_valid = False
-
-        if civitai_token:
-            try:
-                r = self.session.get(
-                    "https://civitai.com/api/v1/model-versions/128713",
-                    headers={"Authorization": f"Bearer {civitai_token}"},
-                    timeout=10,
-                )
-                civitai_valid = (r.status_code == 200)
-                self.log("✅ CivitAI token validated" if civitai_valid else "❌ CivitAI token validation failed")
-            except Exception as e:
-                self.log(f"CivitAI token validation error: {e}")
-                civitai_valid = False
-
-        return hf_valid, civitai_valid
+    @staticmethod
+    def _token_entry_fresh(entry: dict, now: float) -> bool:
+        ttl = TOKEN_CACHE_VALID_TTL if entry.get("valid") else TOKEN_CACHE_TTL
+        return now - entry.get("ts", 0) < ttl
+
+    def _token_cache_lookup(self, service: str, token: str) -> Optional[bool]:
+        """Return a still-fresh cached validation result, if any."""
+        try:
+            entry = json.loads(TOKEN_CACHE_FILE.read_text())[self._token_cache_key(service, token)]
+            if self._token_entry_fresh(entry, time.time()):
+                return bool(entry["valid"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def _token_cache_store(self, service: str, token: str, valid: bool) -> None:
+        """Record a validation result in the user-private token cache (best effort)."""
+        try:
+            # Serialize the read-modify-write so concurrent stores can't drop each other's entry
+            with _TOKEN_CACHE_LOCK:
+                try:
+                    cache = json.loads(TOKEN_CACHE_FILE.read_text())
+                except (OSError, ValueError):
+                    cache = {}
+                now = time.time()
+                cache = {k: v for k, v in cache.items()
+                         if k.startswith(f"v{TOKEN_CACHE_VERSION}:") and self._token_entry_fresh(v, now)}
+                cache[self._token_cache_key(service, token)] = {"valid": valid, "ts": now}
+                TOKEN_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+                fd = os.open(TOKEN_CACHE_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, "w") as f:
+                    json.dump(cache, f)
+        except (OSError, AttributeError) as e:
+            self.log(f"Could not update token cache: {e}", is_debug=True)
+
+    def _validate_hf_token(self, token: str) -> bool:
+        """Check the HF token against whoami-v2 (result cached across runs)."""
+        cached = self._token_cache_lookup("hf", token)
+        if cached is not None:
+            self.log(f"HuggingFace token validation cached ({'valid' if cached else 'invalid'})", is_debug=True)
+            return cached
+        try:
+            r = self._api_request(
+                "GET",
+                "https://huggingface.co/api/whoami-v2",
+                headers=_bearer(token),
+                timeout=10,
+            )
+            valid = (r.status_code == 200)
+            self.log("✅ HuggingFace token validated" if valid else "❌ HuggingFace token validation failed")
+            if r.status_code in (200, 401, 403):
+                self._token_cache_store("hf", token, valid)
+            return valid
+        except Exception as e:
+            self.log(f"HuggingFace token validation error: {e}")
+            return False
+
+    def _validate_civitai_token(self, token: str) -> bool:
+        """Check the CivitAI token with a HEAD on a known model (result cached across runs)."""
+        cached = self._token_cache_lookup("civitai", token)
+        if cached is not None:
+            self.log(f"CivitAI token validation cached ({'valid' if cached else 'invalid'})", is_debug=True)
+            return cached
+        try:
+            # Only the status matters, so skip the body unless HEAD is refused
+            url = "https://civitai.com/api/v1/model-versions/128713"
+            auth = _bearer(token)
+            r = self._api_request("HEAD", url, auth, timeout=10)
+            if r.status_code == 405:
+                r = self._api_request("GET", url, auth, timeout=10)
+            valid = (r.status_code == 200)
+            self.log("✅ CivitAI token validated" if valid else "❌ CivitAI token validation failed")
+            if r.status_code in (200, 401, 403):
+                self._token_cache_store("civitai", token, valid)
+            return valid
+        except Exception as e:
+            self.log(f"CivitAI token validation error: {e}")
+            return False
+
+    def _ensure_hf_token(self, token: Optional[str]) -> bool:
+        """Validate the HF token once per process, right before it is first needed."""
+        with self._hf_token_lock:
+            if self._hf_token_valid is None:
+                self._hf_token_valid = self._validate_hf_token(token) if token else True
+            return self._hf_token_valid
+
+    def _ensure_civitai_token(self, token: Optional[str]) -> bool:
+        """Validate the CivitAI token once per process; no token means public downloads only."""
+        with self._civitai_token_lock:
+            if self._civitai_token_valid is None:
+                self._civitai_token_valid = self._validate_civitai_token(token) if token else True
+            return self._civitai_token_valid
 
     # ---------- Hugging Face ----------
 
+    def _hf_complete_marker(self, repo_id: str) -> Path:
+        return self.hf_complete_dir / repo_id.replace("/", "--")
+
     def _check_hf_repo_exists(self, repo_id: str) -> bool:
-        """Check if HF repo already exists in final location."""
+        """Check if HF repo was fully downloaded to its final location."""
         final_dir = self.models_dir / "huggingface" / repo_id
-        if final_dir.exists() and any(final_dir.iterdir()):
-            self.log(f"✅ HF repo '{repo_id}' already exists in final location")
-            return True
-        return False
+        try:
+            # One opendir + a single readdir batch; no Path objects or extra exists() stat
+            with os.scandir(final_dir) as it:
+                has_any = next(it, None) is not None
+        except (FileNotFoundError, NotADirectoryError):
+            return False
+        if not has_any:
+            return False
+        if not os.path.lexists(self._hf_complete_marker(repo_id)):
+            # Interrupted run: snapshot_download skips the files it already has
+            self.log(f"⏯️ HF repo '{repo_id}' is incomplete - will resume download")
+            return False
+        self.log(f"✅ HF repo '{repo_id}' already exists in final location")
+        return True
+
+    def _download_one_hf(self, repo_id: str, final_dir: Path, token: Optional[str] = None) -> Tuple[str, bool]:
+        """Download a single HF repo into its final directory (in-process)."""
+        from huggingface_hub import snapshot_download
+
+        if self._cancelled.is_set():
+            return (repo_id, False)
+        self.log(f"Starting HF download: {repo_id}")
+        if token:
+            self.log("Using provided HuggingFace token", is_debug=True)
+        else:
+            self.log("No HuggingFace token provided", is_debug=True)
+
+        try:
+            self.log(f"snapshot_download {repo_id} -> {final_dir}", is_debug=True)
+            # local_dir gets real files (no symlinks) and partial downloads resume by default
+            snapshot_download(
+                repo_id=repo_id,
+                local_dir=str(final_dir),
+                token=token or None,
+                max_workers=8,
+            )
+            self._hf_complete_marker(repo_id).touch()
+            self.log(f"✅ Completed HF download: {repo_id}")
+            return (repo_id, True)
+        except Exception as e:
+            self.log(f"❌ ERROR: Failed to download '{repo_id}'.")
+            self.log(f"   {type(e).__name__}: {e}", is_debug=True)
+            if not token:
+                self.log("   HINT: Private/gated repo. Provide HUGGINGFACE_TOKEN.")
+            else:
+                self.log("   HINT: Check token/repo access.")
+            self.log("   ⏭️ Continuing…")
+            return (repo_id, False)
 
     def download_hf_repos(self, repos_list: str, token: Optional[str] = None) -> Tuple[int, int]:
-        """Download HuggingFace repositories directly to final locations."""
+        """Download HuggingFace repositories directly to final locations, several at a time."""
         if not repos_list:
             self.log("No Hugging Face repos specified to download.")
             return (0, 0)
-        if not self._require_tools("huggingface-cli"):
+        if importlib.util.find_spec("huggingface_hub") is None:
+            self.log("❌ Required module not found: huggingface_hub")
             return (0, 1)
+        token = _clean_token(token)
 
         self.log("Found Hugging Face repos to download...")
-        repos = [r.strip() for r in repos_list.split(",") if r.strip()]
+        # Order-preserving dedupe so a repo listed twice is only downloaded once
+        repos = list(dict.fromkeys(r.strip() for r in repos_list.split(",") if r.strip()))
 
         # Ensure HF models directory exists
         hf_models_dir = self.models_dir / "huggingface"
         hf_models_dir.mkdir(exist_ok=True)
 
-        ok, fail, skipped = 0, 0, 0
-        for repo_id in repos:
-            # Check if already exists
-            if self._check_hf_repo_exists(repo_id):
-                skipped += 1
-                continue
-
-            self.log(f"Starting HF download: {repo_id}")
-            final_dir = hf_models_dir / repo_id
-            
-            cmd = [
-                "huggingface-cli", "download", repo_id,
-                "--local-dir", str(final_dir),
-                "--local-dir-use-symlinks", "False",
-                "--resume-download",
-            ]
-            if token:
-                cmd.extend(["--token", token])
-                self.log("Using provided HuggingFace token", is_debug=True)
-            else:
-                self.log("No HuggingFace token provided", is_debug=True)
-
-            try:
-                self.log(f"Executing: {' '.join(cmd[:-1])} <repo>", is_debug=True)
-                result = subprocess.run(cmd, check=True, capture_output=not self.debug_mode, text=True)
-                self.log(f"Subprocess exit {result.returncode}", is_debug=True)
-                self.log(f"✅ Completed HF download: {repo_id}")
-                ok += 1
-            except subprocess.CalledProcessError as e:
-                self.log(f"❌ ERROR: Failed to download '{repo_id}'.")
-                if not token:
-                    self.log("   HINT: Private/gated repo. Provide HUGGINGFACE_TOKEN.")
-                else:
-                    self.log("   HINT: Check token/repo access.")
-                if self.debug_mode and e.stderr:
-                    self.log(f"stderr: {e.stderr.strip()}", is_debug=True)
-                self.log("   ⏭️ Continuing…")
-                fail += 1
+        # Check what already exists before spinning up workers
+        pending = [repo_id for repo_id in repos if not self._check_hf_repo_exists(repo_id)]
+        skipped = len(repos) - len(pending)
+
+        ok, fail = 0, 0
+        if pending and not self._ensure_hf_token(token):
+            self.log("⚠️ Skipping HuggingFace downloads due to token validation failure")
+            fail = len(pending)
+        elif pending:
+            if not self.debug_mode:
+                # Parallel tqdm bars only garble the log; the CLI's output was discarded too
+                from huggingface_hub.utils import disable_progress_bars
+                disable_progress_bars()
+            workers = min(len(pending), self._workers("HF_PARALLEL", 4))
+            self.log(f"Downloading {len(pending)} HF repos with {workers} workers", is_debug=True)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(self._download_one_hf, repo_id, hf_models_dir / repo_id, token)
+                    for repo_id in pending
+                ]
+                for fut in as_completed(futures):
+                    _, success = fut.result()
+                    if success:
+                        ok += 1
+                    else:
+                        fail += 1
 
         if skipped > 0:
             self.log(f"Skipped {skipped} already-downloaded HF repos")
@@ -214,16 +635,28 @@ class NexisDownloader:
 
     # ---------- CivitAI ----------
 
-    def _check_civitai_model_exists(self, filename: str, model_type: str, expected_hash: str = "") -> bool:
+    def _check_civitai_model_exists(self, filename: str, model_type: str, expected_hash: str = "",
+                                    expected_size: int = 0) -> bool:
         """Check if CivitAI model already exists in final location."""
-        final_file = self.models_dir / model_type.lower() / filename
+        final_file = self._type_dir(model_type) / filename
         if not final_file.exists():
             return False
-            
-        # If we have a hash, verify it
+
+        # Interrupted download: leave it for aria2c --continue rather than hashing or refetching it
+        if self._is_partial(final_file, expected_size):
+            self.log(f"⏯️ {model_type} '{filename}' is incomplete - will resume download")
+            return False
+
+        # If we have a hash, verify it (unless this exact file was verified before)
         if expected_hash and expected_hash.strip():
-            if self._verify_checksum(final_file, expected_hash):
+            sha = expected_hash.strip().lower()
+            if self._is_marked_verified(final_file, sha):
+                self.log(f"✅ {model_type} '{filename}' already exists (verified previously)")
+                return True
+            if self._verify_checksum(final_file, expected_hash, expected_size):
                 self.log(f"✅ {model_type} '{filename}' already exists and verified")
+                self._add_to_hash_store(final_file, sha)
+                self._mark_verified(final_file, sha)
                 return True
             else:
                 self.log(f"⚠️ {model_type} '{filename}' exists but checksum mismatch - will re-download")
@@ -233,21 +666,118 @@ class NexisDownloader:
                     pass
                 return False
         else:
-            # No hash available, assume existing file is good
+            if expected_size and final_file.stat().st_size - expected_size >= 1024:
+                self.log(f"⚠️ {model_type} '{filename}' is larger than published - will re-download")
+                try:
+                    final_file.unlink()
+                except Exception:
+                    pass
+                return False
+            # No hash available; size is all we can check
             self.log(f"✅ {model_type} '{filename}' already exists (no checksum verification)")
             return True
 
+    @staticmethod
+    def _is_partial(final_file: Path, expected_size: int = 0) -> bool:
+        """True if aria2c left a control file, or the file is short of the published size."""
+        if final_file.with_name(final_file.name + ".aria2").exists():
+            return True
+        try:
+            # sizeKB is a float; only a shortfall of a full KiB or more counts
+            return bool(expected_size) and expected_size - final_file.stat().st_size >= 1024
+        except OSError:
+            return False
+
+    def _meta_cache_path(self, model_id: str, token: Optional[str]) -> Path:
+        key = hashlib.sha256(f"{model_id}:{bool(token)}".encode()).hexdigest()
+        return self.meta_cache_dir / f"{key}.json"
+
+    def _write_meta_cache(self, cache_file: Path, entry: dict) -> None:
+        """Atomically persist a metadata cache entry (best effort)."""
+        tmp = cache_file.with_name(f"{cache_file.name}.{threading.get_ident()}.tmp")
+        try:
+            tmp.write_text(json.dumps(entry))
+            os.replace(tmp, cache_file)
+        except OSError as e:
+            self.log(f"Could not write metadata cache {cache_file.name}: {e}", is_debug=True)
+            tmp.unlink(missing_ok=True)
+
+    def _cached_civitai_info(self, model_id: str, token: Optional[str], max_age: float) -> Optional[dict]:
+        """Return cached metadata no older than ``max_age`` seconds, without any HTTP."""
+        cache_file = self._meta_cache_path(model_id, token)
+        try:
+            if time.time() - cache_file.stat().st_mtime < max_age:
+                return json.loads(cache_file.read_text())["info"]
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+
+    def _civitai_file_in_place(self, model_id: str, model_type: str, token: Optional[str]) -> bool:
+        """Re-run fast path: cached metadata names the file and a verification record vouches for it."""
+        info = self._cached_civitai_info(model_id, token, META_CACHE_MAX_AGE)
+        if not info or not info.get("filename"):
+            return False
+        final_file = self._type_dir(model_type) / info["filename"]
+        if info.get("hash"):
+            in_place = self._is_marked_verified(final_file, info["hash"])
+        else:
+            in_place = final_file.exists() and not self._is_partial(final_file, int(info.get("size") or 0))
+        if in_place:
+            self.log(f"✅ {model_type} '{info['filename']}' already exists (cached metadata)")
+        return in_place
+
     def get_civitai_model_info(self, model_id: str, token: Optional[str] = None) -> Optional[dict]:
-        """Get model file metadata from CivitAI."""
-        headers: Dict[str, str] = {}
-        if token:
-            headers["Authorization"] = f"Bearer {token}"
+        """Get model file metadata from CivitAI, memoized for the lifetime of this downloader."""
+        key = (model_id, bool(token))
+        with self._meta_lock:
+            if key in self._meta_memo:
+                return self._meta_memo[key]
+        info = self._fetch_civitai_model_info(model_id, token)
+        if info:
+            with self._meta_lock:
+                self._meta_memo[key] = info
+        return info
+
+    def get_civitai_model_infos(self, ids: List[str], token: Optional[str] = None,
+                                max_workers: int = 16) -> Dict[str, Optional[dict]]:
+        """Fetch metadata for many model versions at once, keyed by ID in input order.
+
+        CivitAI has no batch endpoint, so the requests are fanned out over
+        threads and multiplexed as parallel streams on the HTTP/2 connection.
+        """
+        if not ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(ids)))) as pool:
+            infos = pool.map(lambda mid: self.get_civitai_model_info(mid, token), ids)
+            return dict(zip(ids, infos))
+
+    def _fetch_civitai_model_info(self, model_id: str, token: Optional[str] = None) -> Optional[dict]:
+        """Fetch model file metadata, served from the on-disk cache when fresh."""
+        headers = _bearer(token)
+        cache_file = self._meta_cache_path(model_id, token)
+        cached: Optional[dict] = None
+        try:
+            cached = json.loads(cache_file.read_text())
+            if time.time() - cache_file.stat().st_mtime < META_CACHE_TTL:
+                self.log(f"Using cached metadata for model {model_id}", is_debug=True)
+                return cached["info"]
+            if cached.get("etag"):
+                headers = {**headers, "If-None-Match": cached["etag"]}
+        except (OSError, ValueError, KeyError):
+            cached = None
 
         api_url = f"https://civitai.com/api/v1/model-versions/{model_id}"
         self.log(f"Fetching metadata: {api_url}", is_debug=True)
 
         try:
-            r = self.session.get(api_url, headers=headers, timeout=30)
+            r = self._api_request("GET", api_url, headers, timeout=30)
+            if r.status_code == 304 and cached:
+                self.log(f"Metadata for model {model_id} not modified (ETag match)", is_debug=True)
+                try:
+                    os.utime(cache_file)
+                except OSError:
+                    pass
+                return cached["info"]
             r.raise_for_status()
             data = r.json()
             files = data.get("files") or []
@@ -259,55 +789,56 @@ class NexisDownloader:
             download_url = primary.get("downloadUrl") or f"https://civitai.com/api/download/models/{model_id}"
             sha = (primary.get("hashes") or {}).get("SHA256", "")
 
-            return {
+            info = {
                 "filename": primary.get("name"),
                 "download_url": download_url,
                 "hash": sha.strip().lower() if sha else "",
-                "size": (primary.get("sizeKB", 0) or 0) * 1024,
+                "size": int(round((primary.get("sizeKB", 0) or 0) * 1024)),
             }
-        except requests.RequestException as e:
+            self._write_meta_cache(cache_file, {"etag": r.headers.get("ETag", ""), "info": info})
+            return info
+        except (httpx.HTTPError, ValueError) as e:
             self.log(f"API request failed for model {model_id}: {e}", is_debug=True)
             return None
 
-    def _host_is_civitai(self, url: str) -> bool:
-        try:
-            return urlparse(url).hostname in {"civitai.com", "www.civitai.com"}
-        except Exception:
-            return False
+    _CIVITAI_PREFIXES = (
+        "https://civitai.com/", "https://www.civitai.com/",
+        "http://civitai.com/", "http://www.civitai.com/",
+    )
 
-    def download_civitai_model(self, model_id: str, model_type: str, token: Optional[str] = None) -> bool:
-        """Download a single model from CivitAI directly to final location."""
-        if not model_id:
-            return True
-        if not self._require_tools("aria2c", "sha256sum"):
-            return False
+    def _host_is_civitai(self, url: str) -> bool:
+        return url.lower().startswith(self._CIVITAI_PREFIXES)
 
-        self.log(f"Processing Civitai model ID: {model_id}", is_debug=True)
-
-        # 1) Get metadata
-        info = self.get_civitai_model_info(model_id, token)
-        if not info or not info.get("filename"):
-            self.log(f"❌ ERROR: Could not retrieve metadata for Civitai model ID {model_id}.")
-            return False
+    def _prepare_civitai_job(self, model_id: str, model_type: str, auth: Mapping[str, str],
+                             info: dict) -> Optional[dict]:
+        """Turn metadata into an aria2c job; returns None when the file is already in place.
 
+        ``auth`` is the prebuilt Authorization header (empty for anonymous access).
+        """
         filename = info["filename"]
         download_url = info["download_url"]
         remote_hash = info["hash"]
+        remote_size = int(info.get("size") or 0)
 
         self.log(f"Filename: {filename}", is_debug=True)
         self.log(f"Download URL: {download_url}", is_debug=True)
 
-        # 2) Check if already exists
-        if self._check_civitai_model_exists(filename, model_type, remote_hash):
-            return True
+        # Already exists (and verifies)?
+        if self._check_civitai_model_exists(filename, model_type, remote_hash, remote_size):
+            return None
 
-        # 3) Resolve one-hop redirect to presigned R2 URL
-        headers_dict: Dict[str, str] = {}
-        if token and token.strip():
-            headers_dict["Authorization"] = f"Bearer {token.strip()}"
+        # Same content already downloaded under another name/type: link it, zero bytes transferred
+        if remote_hash and self._link_from_hash_store(remote_hash, model_type, filename):
+            return None
 
+        # Resolve one-hop redirect to presigned R2 URL. Goes over the HTTP/2 API client, so
+        # these HEADs multiplex on the connection the metadata fan-out already warmed.
         try:
-            r = self.session.get(download_url, headers=headers_dict, allow_redirects=False, timeout=30)
+            r = self._api_request("HEAD", download_url, auth, timeout=30)
+            if r.status_code == 405:
+                # HEAD refused: fall back to GET but never read the body (closing resets the stream)
+                with self.api.stream("GET", download_url, headers=auth, timeout=30) as r:
+                    pass
             if r.status_code in (301, 302, 303, 307, 308) and "location" in r.headers:
                 final_url = r.headers["location"]
                 self.log("Resolved final URL for download (no auth header on R2):", is_debug=True)
@@ -318,84 +849,319 @@ class NexisDownloader:
             self.log(f"Redirect resolution failed: {e}", is_debug=True)
             final_url = download_url
 
-        # 4) Prepare final location
-        model_dir = self.models_dir / model_type.lower()
-        model_dir.mkdir(exist_ok=True)
-        output_file = model_dir / filename
-
-        self.log(f"Starting Civitai download: {filename} ({model_type})")
+        model_dir = self._type_dir(model_type)
 
-        # 5) Build aria2c command
-        headers = []
-        if self._host_is_civitai(final_url) and token and token.strip():
-            headers.append(f"--header=Authorization: Bearer {token.strip()}")
+        # The presigned R2 URL carries its own credentials; only CivitAI itself gets the token
+        job_auth = auth if self._host_is_civitai(final_url) else {}
+        if job_auth:
             self.log("Using Authorization header for CivitAI", is_debug=True)
 
-        cmd = [
+        return {
+            "model_id": model_id,
+            "filename": filename,
+            "dir": model_dir,
+            "url": final_url,
+            "hash": remote_hash,
+            "size": remote_size,
+            "auth": job_auth,
+        }
+
+    def _aria2_args(self, conns: int) -> List[str]:
+        """aria2c options shared by single-file and batch invocations."""
+        c = str(conns)
+        return [
             "aria2c",
-            "-x", "4",
-            "-s", "4",
+            "-x", c,
+            "-s", c,
+            f"--max-connection-per-server={c}",
+            "--min-split-size=2M",
+            "--piece-length=1M",
+            "--file-allocation=none",
+            "--disk-cache=64M",
+            "--http-accept-gzip=true",
+            "--optimize-concurrent-downloads=true",
             "--continue=true",
             "--retry-wait=5",
-            "--max-tries=2",
+            "--max-tries=5",
             "--console-log-level=info" if self.debug_mode else "--console-log-level=warn",
             "--summary-interval=10" if self.debug_mode else "--summary-interval=0",
-            f"--dir={model_dir}",
-            f"--out={filename}",
-            *headers,
-            final_url,
         ]
 
-        # 6) Execute + verify
+    def _log_aria2_hint(self, returncode: int, stderr: Optional[str]) -> None:
+        """Translate an aria2c failure into a user-facing hint."""
+        if returncode in _ARIA2_EXIT_HINTS:
+            self.log(_ARIA2_EXIT_HINTS[returncode])
+            return
+        stderr_s = stderr.lower() if isinstance(stderr, str) else ""
+        for needles, hint in _STDERR_HINTS:
+            if any(n in stderr_s for n in needles):
+                self.log(hint)
+                return
+
+    def _discard_partial(self, output_file: Path, expected_size: int = 0) -> None:
+        """Remove a failed download and its aria2 control file, unless it can resume.
+
+        A file that still has its ``.aria2`` control file and is short of the
+        published size is kept: _is_partial sends it back to ``--continue``.
+        After cancel() nothing is removed, since aria2c was stopped on purpose.
+        """
+        if self._cancelled.is_set():
+            return
+        control_file = output_file.with_name(output_file.name + ".aria2")
         try:
-            self.log(f"Executing: {' '.join(cmd[:-1])} <url>", is_debug=True)
-            result = subprocess.run(cmd, check=True, capture_output=not self.debug_mode, text=True)
-            self.log(f"Subprocess exit {result.returncode}", is_debug=True)
-            self.log(f"✅ Download completed for {filename}")
-
-            if remote_hash:
-                self.log(f"Verifying checksum for {filename}...", is_debug=True)
-                if self._verify_checksum(output_file, remote_hash):
-                    self.log(f"✅ Checksum verification PASSED for {filename}.")
-                else:
-                    self.log(f"❌ DOWNLOAD ERROR: Checksum verification FAILED for {filename}.")
-                    try:
-                        output_file.unlink(missing_ok=True)
-                    except Exception:
-                        pass
-                    return False
-            else:
-                self.log("No checksum available; skipping validation", is_debug=True)
+            # A full-length file that failed is a checksum mismatch; resuming would only repeat it
+            resumable = control_file.exists() and (
+                not expected_size or expected_size - output_file.stat().st_size >= 1024)
+        except OSError:
+            resumable = False
+        if resumable:
+            self.log(f"   Keeping partial file for resume: {output_file.name}")
+            return
+        if output_file.exists():
+            self.log(f"   Removing partial file: {output_file.name}")
+        for p in (output_file, control_file):
+            try:
+                p.unlink(missing_ok=True)
+            except Exception:
+                pass
 
-            self.log(f"✅ Successfully completed Civitai download: {filename}")
+    def download_civitai_model(self, model_id: str, model_type: str, token: Optional[str] = None) -> bool:
+        """Download a single model from CivitAI directly to final location."""
+        if not model_id:
             return True
+        _, failed = self.download_civitai_by_type({model_type: [model_id]}, token)[model_type]
+        return failed == 0
+
+    def _finish_civitai_job(self, job: dict) -> None:
+        """Log success and register the verified file in the hash store."""
+        filename = job["filename"]
+        self.log(f"✅ Download completed for {filename}")
+        if job["hash"]:
+            self.log(f"✅ Checksum verification PASSED for {filename}.")
+            self._add_to_hash_store(job["dir"] / filename, job["hash"])
+            self._mark_verified(job["dir"] / filename, job["hash"])
+        else:
+            self.log("No checksum available; skipping validation", is_debug=True)
+        self.log(f"✅ Successfully completed Civitai download: {filename}")
+
+    def _download_civitai_batch(self, jobs: List[dict], workers: int, conns: int) -> List[bool]:
+        """Download all jobs with one aria2c process driven by an input file.
+
+        aria2c schedules ``workers`` files at a time itself. Entries it could not
+        finish are written to ``--save-session``, which is how per-file results
+        are recovered from a single exit code.
+        """
+        fd, input_path = tempfile.mkstemp(prefix="aria2-", suffix=".in", dir=self.download_tmp_dir)
+        session_fd, session_path = tempfile.mkstemp(prefix="aria2-", suffix=".session", dir=self.download_tmp_dir)
+        os.close(session_fd)
+        try:
+            # mkstemp creates the file 0600, which matters since entries may carry the token
+            with os.fdopen(fd, "w") as f:
+                for job in jobs:
+                    f.write(f"{job['url']}\n  dir={job['dir']}\n  out={job['filename']}\n")
+                    if job["hash"]:
+                        f.write(f"  checksum=sha-256={job['hash']}\n")
+                    for k, v in job["auth"].items():
+                        f.write(f"  header={k}: {v}\n")
+
+            cmd = self._aria2_args(conns) + [
+                f"--max-concurrent-downloads={workers}",
+                f"--input-file={input_path}",
+                f"--save-session={session_path}",
+            ]
+            error: Optional[subprocess.CalledProcessError] = None
+            try:
+                self.log(f"Executing: {' '.join(cmd)}", is_debug=True)
+                self._run(cmd)
+            except subprocess.CalledProcessError as e:
+                error = e
 
-        except subprocess.CalledProcessError as e:
-            self.log(f"❌ DOWNLOAD ERROR: Failed to download {filename} from Civitai.")
-            self.log(f"   aria2c exit code: {e.returncode}")
-            if self.debug_mode and e.stderr:
-                self.log(f"   stderr: {e.stderr.strip()}", is_debug=True)
-
-            if output_file.exists():
-                self.log(f"   Removing partial file: {filename}")
+            unfinished = set()
+            try:
+                current_dir = ""
+                for line in Path(session_path).read_text().splitlines():
+                    opt = line.strip()
+                    if opt.startswith("dir="):
+                        current_dir = opt[4:]
+                    elif opt.startswith("out="):
+                        unfinished.add(os.path.join(current_dir, opt[4:]))
+            except OSError:
+                pass
+        finally:
+            for p in (input_path, session_path):
                 try:
-                    output_file.unlink(missing_ok=True)
-                except Exception:
+                    os.unlink(p)
+                except OSError:
                     pass
 
-            stderr_s = (e.stderr or "").lower() if isinstance(e.stderr, str) else ""
-            if e.returncode == 22:
-                self.log("   HINT: HTTP error — auth or URL issue.")
-            elif "403" in stderr_s or "forbidden" in stderr_s:
-                self.log("   HINT: Private model. Provide a valid CIVITAI_TOKEN.")
-            elif "404" in stderr_s or "not found" in stderr_s:
-                self.log(f"   HINT: Model ID {model_id} may not exist or was removed.")
-            elif "timeout" in stderr_s or "connection" in stderr_s:
-                self.log("   HINT: Network issue. Retry may succeed.")
+        results = []
+        for job in jobs:
+            output_file = job["dir"] / job["filename"]
+            control_file = output_file.with_name(output_file.name + ".aria2")
+            if str(output_file) in unfinished or not output_file.exists() or control_file.exists():
+                self.log(f"❌ DOWNLOAD ERROR: Failed to download {job['filename']} from Civitai.")
+                self._discard_partial(output_file, job["size"])
+                results.append(False)
+            else:
+                self._finish_civitai_job(job)
+                results.append(True)
+
+        if error is not None:
+            self.log(f"   aria2c exit code: {error.returncode}")
+            self._log_aria2_hint(error.returncode, error.stderr)
+        return results
+
+    def _download_in_process(self, job: dict, conns: int) -> bool:
+        """Fallback when aria2c is missing: parallel Range requests over the pooled session.
+
+        Slices are written with pwrite into ``<file>.part``, which is verified and
+        then renamed into place, so a failure never leaves a short model file.
+        A ``.part`` shorter than the file is resumed with a single Range request;
+        split downloads preallocate the full length, so theirs restart from scratch.
+        """
+        output_file = job["dir"] / job["filename"]
+        part_file = output_file.with_name(output_file.name + ".part")
+        headers = job["auth"]
+        published = job["size"]
+
+        try:
+            # A one-byte GET rather than HEAD: presigned R2 URLs are signed for GET only
+            with self.session.get(job["url"], headers={**headers, "Range": "bytes=0-0"},
+                                  stream=True, timeout=30) as r:
+                r.raise_for_status()
+                accepts_ranges = r.status_code == 206
+                if accepts_ranges:
+                    total = r.headers.get("Content-Range", "").rpartition("/")[2]
+                    size = int(total) if total.isdigit() else 0
+                else:
+                    size = int(r.headers.get("Content-Length") or 0)
+            if not size and not published and not job["hash"]:
+                raise ValueError("no size or hash available to tell a complete file from a truncated one")
+
+            have = part_file.stat().st_size if part_file.exists() else 0
+            resume = accepts_ranges and 0 < have < size
+            ranged = accepts_ranges and not resume and size >= RANGE_MIN_SPLIT * 2
+
+            flags = os.O_WRONLY | os.O_CREAT | (0 if resume else os.O_TRUNC)
+            fd = os.open(part_file, flags, 0o644)
+            try:
+                def fetch(lo: int, hi: Optional[int]) -> None:
+                    h = dict(headers)
+                    if lo or hi is not None:
+                        h["Range"] = f"bytes={lo}-{'' if hi is None else hi}"
+                    with self.session.get(job["url"], headers=h, stream=True, timeout=60) as resp:
+                        resp.raise_for_status()
+                        if "Range" in h and resp.status_code != 206:
+                            raise requests.HTTPError(f"expected 206 for a range request, got {resp.status_code}")
+                        offset = lo
+                        for chunk in resp.iter_content(chunk_size=1 << 20):
+                            os.pwrite(fd, chunk, offset)
+                            offset += len(chunk)
+                    if hi is not None and offset != hi + 1:
+                        raise requests.HTTPError(f"short range read ({offset - lo} of {hi - lo + 1} bytes)")
+
+                if resume:
+                    self.log(f"Resuming {job['filename']} at {have} of {size} bytes", is_debug=True)
+                    fetch(have, None)
+                elif ranged:
+                    os.ftruncate(fd, size)
+                    n = max(1, min(conns, size // RANGE_MIN_SPLIT))
+                    step = -(-size // n)
+                    bounds = [(lo, min(lo + step, size) - 1) for lo in range(0, size, step)]
+                    self.log(f"Fetching {job['filename']} in {len(bounds)} ranges", is_debug=True)
+                    with ThreadPoolExecutor(max_workers=len(bounds)) as pool:
+                        for fut in [pool.submit(fetch, lo, hi) for lo, hi in bounds]:
+                            fut.result()
+                else:
+                    fetch(0, None)
+            finally:
+                os.close(fd)
+
+            got = part_file.stat().st_size
+            if size and got != size:
+                raise ValueError(f"size mismatch ({got} of {size} bytes)")
+            # sizeKB is a float; anything off by a full KiB is a different (or truncated) file
+            if not size and published and abs(got - published) >= 1024:
+                raise ValueError(f"size mismatch ({got} bytes, published {published})")
+            if job["hash"] and not self._verify_checksum(part_file, job["hash"], size or published):
+                raise ValueError("checksum verification failed")
+            os.replace(part_file, output_file)
+            return True
+        except (requests.RequestException, OSError, ValueError) as e:
+            self.log(f"❌ DOWNLOAD ERROR: Failed to download {job['filename']} from Civitai.")
+            self.log(f"   {type(e).__name__}: {e}")
+            # A dropped connection leaves a .part worth resuming; bad content does not
+            if not isinstance(e, requests.RequestException):
+                part_file.unlink(missing_ok=True)
             return False
 
-    def _verify_checksum(self, file_path: Path, expected_hash: str) -> bool:
-        """Verify SHA256 checksum with detailed error logging."""
+    def _link_from_hash_store(self, sha256: str, model_type: str, filename: str) -> bool:
+        """Hard-link a previously verified file with this hash into place."""
+        stored = self.hash_store_dir / sha256
+        if not stored.exists():
+            return False
+        model_dir = self._type_dir(model_type)
+        try:
+            os.link(stored, model_dir / filename)
+        except OSError as e:
+            self.log(f"Could not link {filename} from hash store: {e}", is_debug=True)
+            return False
+        self._mark_verified(model_dir / filename, sha256)
+        self.log(f"✅ {model_type} '{filename}' linked from previously verified download")
+        return True
+
+    def _prune_hash_store(self) -> None:
+        """Drop store entries whose model file was deleted, so its disk space is freed."""
+        pruned, freed = 0, 0
+        try:
+            with os.scandir(self.hash_store_dir) as it:
+                for entry in it:
+                    st = entry.stat(follow_symlinks=False)
+                    # nlink 1: the store holds the last link, nothing in models/ uses it
+                    if st.st_nlink == 1:
+                        os.unlink(entry.path)
+                        pruned += 1
+                        freed += st.st_size
+        except OSError as e:
+            self.log(f"Could not prune hash store: {e}", is_debug=True)
+        if pruned:
+            self.log(f"Freed {freed >> 20} MiB held by {pruned} deleted model(s)")
+
+    def _add_to_hash_store(self, file_path: Path, sha256: str) -> None:
+        """Register a verified file in the hash store (best effort)."""
+        try:
+            os.link(file_path, self.hash_store_dir / sha256)
+        except FileExistsError:
+            pass
+        except OSError as e:
+            self.log(f"Could not add {file_path.name} to hash store: {e}", is_debug=True)
+
+    def _verified_record(self, file_path: Path) -> Path:
+        key = hashlib.sha256(str(file_path).encode()).hexdigest()
+        return self.verified_dir / key
+
+    def _mark_verified(self, file_path: Path, sha256: str) -> None:
+        """Remember that this file, at its current size and mtime, matched ``sha256``."""
+        try:
+            st = file_path.stat()
+            self._verified_record(file_path).write_text(f"{sha256} {st.st_size} {st.st_mtime_ns}")
+        except OSError as e:
+            self.log(f"Could not record verification for {file_path.name}: {e}", is_debug=True)
+
+    def _is_marked_verified(self, file_path: Path, sha256: str) -> bool:
+        """True if a verification record matches the hash and the file is unchanged since."""
+        try:
+            st = file_path.stat()
+            recorded = self._verified_record(file_path).read_text().split()
+        except OSError:
+            return False
+        return recorded == [sha256, str(st.st_size), str(st.st_mtime_ns)]
+
+    def _verify_checksum(self, file_path: Path, expected_hash: str, expected_size: int = 0) -> bool:
+        """Verify SHA256 checksum with detailed error logging.
+
+        When ``expected_size`` is known, a size mismatch fails fast without reading the file.
+        """
         try:
             if not file_path.exists():
                 self.log(f"❌ CHECKSUM ERROR: File does not exist: {file_path}")
@@ -403,9 +1169,15 @@ class NexisDownloader:
             if not expected_hash or not expected_hash.strip():
                 self.log(f"❌ CHECKSUM ERROR: No expected hash provided for {file_path.name}")
                 return False
+            if expected_size:
+                actual_size = file_path.stat().st_size
+                # sizeKB is a float; anything off by a full KiB cannot be the same file
+                if abs(actual_size - expected_size) >= 1024:
+                    self.log(f"❌ SIZE MISMATCH for {file_path.name}: expected {expected_size} bytes, got {actual_size}")
+                    return False
 
-            result = subprocess.run(["sha256sum", str(file_path)], capture_output=True, text=True, check=True)
-            actual_hash = result.stdout.split()[0].lower()
+            with _HASH_SLOTS:
+                actual_hash = _sha256_file(file_path)
             expected_hash_clean = expected_hash.strip().lower()
 
             if actual_hash == expected_hash_clean:
@@ -417,10 +1189,8 @@ class NexisDownloader:
                 self.log(f"   Actual:   {actual_hash}")
                 return False
 
-        except subprocess.CalledProcessError as e:
-            self.log(f"❌ CHECKSUM ERROR: sha256sum failed for {file_path.name}")
-            if e.stderr:
-                self.log(f"   stderr: {e.stderr.strip()}", is_debug=True)
+        except OSError as e:
+            self.log(f"❌ CHECKSUM ERROR: Could not read {file_path.name}: {e}")
             return False
         except Exception as e:
             self.log(f"❌ CHECKSUM ERROR: {type(e).__name__}: {e}")
@@ -428,40 +1198,131 @@ class NexisDownloader:
 
     # ---------- orchestrators ----------
 
-    def process_civitai_downloads(self, download_list: str, model_type: str, token: Optional[str] = None) -> Tuple[int, int]:
-        """Process comma-separated list of CivitAI model-version IDs."""
-        if not download_list:
-            self.log(f"No Civitai {model_type}s specified to download.")
-            return (0, 0)
-
-        self.log(f"Found Civitai {model_type}s to download...")
-        self.log(f"Processing list: {download_list}", is_debug=True)
+    def download_civitai_by_type(self, wanted: Dict[str, List[str]], token: Optional[str] = None,
+                                 meta_workers: int = 16, dl_workers: int = 3) -> Dict[str, Tuple[int, int]]:
+        """Download several model types as one batch; returns (successful, failed) per type.
+
+        Metadata for every ID is fetched in one fan-out and all pending files go
+        through a single aria2c run, so checkpoints, loras and VAEs download
+        side by side instead of one type after another.
+        """
+        wanted = {t: list(dict.fromkeys(ids)) for t, ids in wanted.items()}
+        counts = {t: [0, 0] for t in wanted}
+        token = _clean_token(token)
+
+        # Phase 0: files that cached metadata shows are already in place cost no HTTP at all
+        for model_type, ids in wanted.items():
+            remaining = [mid for mid in ids if not self._civitai_file_in_place(mid, model_type, token)]
+            counts[model_type][0] += len(ids) - len(remaining)
+            wanted[model_type] = remaining
+
+        if not any(wanted.values()):
+            return {t: (ok, fail) for t, (ok, fail) in counts.items()}
+        if not self._ensure_civitai_token(token):
+            for t, ids in wanted.items():
+                if ids:
+                    self.log(f"⚠️ Skipping Civitai {t} due to token validation failure")
+            return {t: (counts[t][0], len(ids)) for t, ids in wanted.items()}
+
+        # Phase 1: metadata for every ID in one fan-out (an ID listed under two types is fetched once)
+        all_ids = list(dict.fromkeys(mid for ids in wanted.values() for mid in ids))
+        infos = self.get_civitai_model_infos(all_ids, token, max_workers=meta_workers)
+
+        jobs = []
+        for model_type, ids in wanted.items():
+            for model_id in ids:
+                info = infos.get(model_id)
+                if info and info.get("filename"):
+                    jobs.append((model_id, model_type, info))
+                else:
+                    self.log(f"❌ ERROR: Could not retrieve metadata for Civitai model ID {model_id}.")
+                    counts[model_type][1] += 1
+
+        # Phase 2: skip files already in place and resolve redirects (HEADs run concurrently)
+        pending: List[dict] = []
+        if jobs:
+            with ThreadPoolExecutor(max_workers=max(1, min(meta_workers, len(jobs)))) as pool:
+                auth = _bearer(token)
+                prepared = pool.map(lambda j: self._prepare_civitai_job(*j[:2], auth, j[2]), jobs)
+                for (_, model_type, _), job in zip(jobs, prepared):
+                    if job is None:
+                        counts[model_type][0] += 1
+                    else:
+                        job["model_type"] = model_type
+                        pending.append(job)
+
+        # Phase 3: one aria2c process for the whole batch. It already splits each
+        # file, so keep the number of concurrent files small.
+        if pending and self._cancelled.is_set():
+            for job in pending:
+                counts[job["model_type"]][1] += 1
+        elif pending:
+            workers = max(1, min(dl_workers, len(pending)))
+            # Split the socket budget so K concurrent files don't open K * NEXIS_ARIA2_X connections
+            conns = max(1, min(_aria2_connections(), ARIA2_MAX_CONNECTIONS // workers))
+            self.log(f"Starting Civitai download of {len(pending)} file(s)")
+            self.log(f"Downloading {len(pending)} files with {workers} workers x {conns} connections", is_debug=True)
+            if _which("aria2c"):
+                results = self._download_civitai_batch(pending, workers, conns)
+            else:
+                self.log("aria2c not found - using built-in downloader")
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(lambda job: self._download_in_process(job, conns), pending))
+                for job, ok in zip(pending, results):
+                    if ok:
+                        self._finish_civitai_job(job)
+            for job, ok in zip(pending, results):
+                counts[job["model_type"]][0 if ok else 1] += 1
 
-        ids = [mid.strip() for mid in download_list.split(",") if mid.strip()]
-        successful, failed = 0, 0
+        return {t: (ok, fail) for t, (ok, fail) in counts.items()}
 
-        for model_id in ids:
-            if self.download_civitai_model(model_id, model_type, token):
-                successful += 1
-            else:
-                failed += 1
-                self.log(f"⏭️ Continuing with remaining {model_type}s...")
+    @staticmethod
+    def _parse_id_list(download_list: str) -> List[str]:
+        return list(dict.fromkeys(mid.strip() for mid in download_list.split(",") if mid.strip()))
 
-        self.log(f"Civitai {model_type}s complete: {successful} successful, {failed} failed")
-        return (successful, failed)
+    def process_civitai_downloads(self, download_list: str, model_type: str, token: Optional[str] = None) -> Tuple[int, int]:
+        """Process comma-separated list of CivitAI model-version IDs."""
+        return self.process_all_civitai_downloads({model_type: download_list}, token)[model_type]
+
+    def process_all_civitai_downloads(self, lists: Dict[str, str],
+                                      token: Optional[str] = None) -> Dict[str, Tuple[int, int]]:
+        """Process comma-separated ID lists for several model types in one batch."""
+        wanted: Dict[str, List[str]] = {}
+        for model_type, download_list in lists.items():
+            if not download_list:
+                self.log(f"No Civitai {model_type} specified to download.")
+                continue
+            self.log(f"Found Civitai {model_type} to download...")
+            self.log(f"Processing list: {download_list}", is_debug=True)
+            wanted[model_type] = self._parse_id_list(download_list)
+
+        results = {t: (0, 0) for t in lists}
+        if wanted:
+            results.update(self.download_civitai_by_type(
+                wanted, token, dl_workers=self._workers("CIVITAI_PARALLEL", 3)
+            ))
+            for model_type in wanted:
+                successful, failed = results[model_type]
+                self.log(f"Civitai {model_type} complete: {successful} successful, {failed} failed")
+        return results
 
     def create_directory_structure(self) -> None:
         """Create organized directory structure."""
-        # Create final model directories
-        for dir_name in ("checkpoints", "loras", "vae"):
+        for dir_name in MODEL_SUBDIRS:
             dir_path = self.models_dir / dir_name
             dir_path.mkdir(exist_ok=True)
+            self._type_dirs[dir_name] = dir_path
             self.log(f"Ensured directory: {dir_path}", is_debug=True)
-        
-        # Create HF models directory
-        hf_dir = self.models_dir / "huggingface"
-        hf_dir.mkdir(exist_ok=True)
-        self.log(f"Ensured directory: {hf_dir}", is_debug=True)
+
+    def _type_dir(self, model_type: str) -> Path:
+        """Final directory for a model type, created (once) on first use."""
+        key = model_type.lower()
+        model_dir = self._type_dirs.get(key)
+        if model_dir is None:
+            model_dir = self.models_dir / key
+            model_dir.mkdir(exist_ok=True)
+            self._type_dirs[key] = model_dir
+        return model_dir
 
 
 def main() -> int:
@@ -476,82 +1337,90 @@ def main() -> int:
     civitai_vaes = os.getenv("CIVITAI_VAES_TO_DOWNLOAD", "")
 
     # Initialize
-    downloader = NexisDownloader(debug_mode=debug_mode)
-    downloader.log("Initializing Nexis Python download manager...")
-
-    # Check if downloads were already completed
-    if downloader.check_completion_marker():
-        downloader.log("All downloads already completed in previous run - skipping")
-        return 0
-
-    if debug_mode:
-        downloader.log("Debug mode enabled - detailed progress on", is_debug=True)
-        downloader.log(f"HF_REPOS_TO_DOWNLOAD: {hf_repos or '<empty>'}", is_debug=True)
-        downloader.log(f"CIVITAI_CHECKPOINTS_TO_DOWNLOAD: {civitai_checkpoints or '<empty>'}", is_debug=True)
-        downloader.log(f"CIVITAI_LORAS_TO_DOWNLOAD: {civitai_loras or '<empty>'}", is_debug=True)
-        downloader.log(f"CIVITAI_VAES_TO_DOWNLOAD: {civitai_vaes or '<empty>'}", is_debug=True)
-
-    # Check if any downloads are configured
-    has_downloads = bool(hf_repos or civitai_checkpoints or civitai_loras or civitai_vaes)
-    if not has_downloads:
-        downloader.log("No downloads configured - creating completion marker and exiting")
-        downloader.create_completion_marker()
-        return 0
-
-    # Network readiness
-    if not downloader.wait_for_network_ready(timeout=60):
-        downloader.log("❌ Network not ready, aborting downloads")
-        return 1
-
-    # Token validation (non-fatal)
-    hf_valid, civitai_valid = downloader.validate_tokens(hf_token, civitai_token)
-    if hf_repos and not hf_valid:
-        downloader.log("⚠️ HF downloads requested but token validation failed")
-    if (civitai_checkpoints or civitai_loras or civitai_vaes) and not civitai_valid:
-        downloader.log("⚠️ CivitAI downloads requested but token validation failed")
-
-    # Prepare filesystem
-    downloader.create_directory_structure()
-
-    # Execute downloads
-    total_downloads = 0
-    total_failures = 0
-
-    # HuggingFace
-    if hf_repos and hf_valid:
-        hf_ok, hf_fail = downloader.download_hf_repos(hf_repos, hf_token)
+    with NexisDownloader(debug_mode=debug_mode) as downloader:
+        downloader.log("Initializing Nexis Python download manager...")
+
+        # Check if downloads were already completed
+        if downloader.check_completion_marker():
+            downloader.log("All downloads already completed in previous run - skipping")
+            return 0
+
+        if debug_mode:
+            downloader.log("Debug mode enabled - detailed progress on", is_debug=True)
+            downloader.log(f"HF_REPOS_TO_DOWNLOAD: {hf_repos or '<empty>'}", is_debug=True)
+            downloader.log(f"CIVITAI_CHECKPOINTS_TO_DOWNLOAD: {civitai_checkpoints or '<empty>'}", is_debug=True)
+            downloader.log(f"CIVITAI_LORAS_TO_DOWNLOAD: {civitai_loras or '<empty>'}", is_debug=True)
+            downloader.log(f"CIVITAI_VAES_TO_DOWNLOAD: {civitai_vaes or '<empty>'}", is_debug=True)
+
+        # Check if any downloads are configured
+        has_downloads = bool(hf_repos or civitai_checkpoints or civitai_loras or civitai_vaes)
+        if not has_downloads:
+            downloader.log("No downloads configured - creating completion marker and exiting")
+            downloader.create_completion_marker()
+            return 0
+
+        # Network readiness, probing only the hosts this run will talk to
+        probe_hosts = tuple(
+            host for host, wanted in (
+                ("huggingface.co", hf_repos),
+                ("civitai.com", civitai_checkpoints or civitai_loras or civitai_vaes),
+            ) if wanted
+        )
+        if not downloader.wait_for_network_ready(timeout=60, hosts=probe_hosts):
+            downloader.log("❌ Network not ready, aborting downloads")
+            return 1
+
+        # Prepare filesystem
+        downloader.create_directory_structure()
+
+        # Execute downloads
+        total_downloads = 0
+        total_failures = 0
+
+        # Tokens are validated lazily by each phase, only if it has work to do
+
+        # HuggingFace and CivitAI use disjoint hosts and tools, so run the phases side by side
+        # No `with`: its __exit__ would wait for both phases even after an interrupt
+        phases = ThreadPoolExecutor(max_workers=2, thread_name_prefix="phase")
+        try:
+            hf_future = phases.submit(downloader.download_hf_repos, hf_repos, hf_token)
+            # CivitAI (allow no token for public): all model types in one batch
+            civitai_future = phases.submit(
+                downloader.process_all_civitai_downloads,
+                {"checkpoints": civitai_checkpoints, "loras": civitai_loras, "vae": civitai_vaes},
+                civitai_token,
+            )
+            hf_ok, hf_fail = hf_future.result()
+            civitai_results = civitai_future.result()
+        except KeyboardInterrupt:
+            downloader.log("⚠️ Interrupted - cancelling downloads")
+            downloader.cancel()
+            # Executor threads are joined at interpreter exit, and in-flight HF and built-in
+            # transfers can't be interrupted, so exit now. Unfinished HF repos have no
+            # completion marker and CivitAI partials keep their .aria2/.part, so both resume.
+            sys.stdout.flush()
+            os._exit(130)
+        finally:
+            phases.shutdown(wait=False, cancel_futures=True)
+
         total_downloads += (hf_ok + hf_fail)
         total_failures += hf_fail
-    elif hf_repos:
-        downloader.log("Skipping HuggingFace downloads due to token validation failure")
-        total_failures += len([repo.strip() for repo in hf_repos.split(",") if repo.strip()])
-
-    # CivitAI (allow no token for public)
-    if civitai_valid or not civitai_token:
-        ck_ok, ck_fail = downloader.process_civitai_downloads(civitai_checkpoints, "checkpoints", civitai_token)
-        lr_ok, lr_fail = downloader.process_civitai_downloads(civitai_loras, "loras", civitai_token)
-        va_ok, va_fail = downloader.process_civitai_downloads(civitai_vaes, "vae", civitai_token)
-
-        total_downloads += (ck_ok + ck_fail + lr_ok + lr_fail + va_ok + va_fail)
-        total_failures += (ck_fail + lr_fail + va_fail)
-    else:
-        downloader.log("Skipping CivitAI downloads due to token validation failure")
-        for downloads in (civitai_checkpoints, civitai_loras, civitai_vaes):
-            if downloads:
-                total_failures += len([mid.strip() for mid in downloads.split(",") if mid.strip()])
-
-    downloader.log(f"All downloads complete. Total: {total_downloads}, Failures: {total_failures}")
-
-    # Create completion marker on successful completion
-    if total_failures == 0:
-        downloader.create_completion_marker()
-        return 0
-    elif total_failures < total_downloads:
-        # Partial success - still create marker to prevent full re-run
-        downloader.create_completion_marker()
-        return 2
-    else:
-        return 1
+        for ok, fail in civitai_results.values():
+            total_downloads += (ok + fail)
+            total_failures += fail
+
+        downloader.log(f"All downloads complete. Total: {total_downloads}, Failures: {total_failures}")
+
+        # Create completion marker on successful completion
+        if total_failures == 0:
+            downloader.create_completion_marker()
+            return 0
+        elif total_failures < total_downloads:
+            # Partial success - still create marker to prevent full re-run
+            downloader.create_completion_marker()
+            return 2
+        else:
+            return 1
 
 
 if __name__ == "__main__":